@@ -4,11 +4,19 @@ A simple sentiment analysis API using a pre-trained model
 """
 
 import os
+import atexit
+import functools
+import json
 import logging
-from typing import Dict, Any
-from flask import Flask, request, jsonify
+import queue
+import re
+import threading
+from typing import Dict, Any, List, Tuple
+from flask import Flask, Response, request
+import orjson
 import boto3
-from botocore.exceptions import ClientError
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -16,61 +24,146 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
-# AWS Services - Initialize with error handling
+# Deployment environment, fixed for the lifetime of the process
+ENVIRONMENT = os.getenv("ENVIRONMENT", "dev")
+
+# AWS Services - Initialize with error handling. Creating the client loads
+# botocore service models, so skip it entirely in tests or when disabled.
 cloudwatch = None
-try:
-    cloudwatch = boto3.client(
-        "cloudwatch", region_name=os.getenv("AWS_DEFAULT_REGION", "us-east-2")
-    )
-except Exception as e:
-    logger.warning(f"CloudWatch not available: {e}")
+if ENVIRONMENT != "test" and os.getenv("DISABLE_CLOUDWATCH") != "1":
+    try:
+        cloudwatch = boto3.client(
+            "cloudwatch",
+            region_name=os.getenv("AWS_DEFAULT_REGION", "us-east-2"),
+            # Enough connections for concurrent gevent requests, and short
+            # timeouts so a slow CloudWatch fails fast instead of piling up
+            config=Config(
+                max_pool_connections=100,
+                connect_timeout=1,
+                read_timeout=2,
+                retries={"max_attempts": 2, "mode": "standard"},
+            ),
+        )
+    except Exception as e:
+        logger.warning(f"CloudWatch not available: {e}")
+else:
+    logger.info("CloudWatch disabled, metrics will not be sent")
+
+# Metrics are buffered and sent by a background thread so that requests
+# never block on CloudWatch. put_metric_data accepts at most 20 datums.
+METRIC_NAMESPACE = "MLModel/SentimentAnalysis"
+METRIC_BATCH_SIZE = 20
+METRIC_FLUSH_INTERVAL = 5.0
+_metric_queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=10_000)
+_metric_flush_event = threading.Event()
+_metric_flush_lock = threading.Lock()
+_METRIC_DIMENSIONS = [{"Name": "Environment", "Value": ENVIRONMENT}]
+
+# Sentiment keywords, shared by every SentimentAnalyzer instance
+POSITIVE_WORDS = frozenset(
+    {
+        "good",
+        "great",
+        "excellent",
+        "amazing",
+        "wonderful",
+        "fantastic",
+        "awesome",
+        "brilliant",
+        "outstanding",
+        "perfect",
+        "love",
+        "like",
+        "happy",
+        "pleased",
+        "satisfied",
+        "impressed",
+        "recommend",
+    }
+)
+
+NEGATIVE_WORDS = frozenset(
+    {
+        "bad",
+        "terrible",
+        "awful",
+        "horrible",
+        "disappointing",
+        "hate",
+        "dislike",
+        "angry",
+        "frustrated",
+        "annoyed",
+        "poor",
+        "worst",
+        "useless",
+        "broken",
+        "failed",
+        "error",
+        "problem",
+        "issue",
+    }
+)
+
+# Result for texts without any sentiment words; copied before returning
+_NEUTRAL_RESULT = {
+    "sentiment": "neutral",
+    "confidence": 0.5,
+    "positive_words": 0,
+    "negative_words": 0,
+}
+
+# Rounded confidence for (winning count, total sentiment words), covering
+# the small counts nearly every text produces
+_CONFIDENCE_TABLE = {
+    (count, total): round(count / total, 3)
+    for total in range(1, 33)
+    for count in range(total + 1)
+}
+
+
+def _confidence(count: int, total: int) -> float:
+    """Return count / total rounded to 3 places, from the table if possible"""
+    confidence = _CONFIDENCE_TABLE.get((count, total))
+    if confidence is None:
+        confidence = round(count / total, 3)
+    return confidence
 
 
 class SentimentAnalyzer:
     """Simple sentiment analysis model"""
 
-    def __init__(self):
-        # Simple keyword-based sentiment analysis
-        self.positive_words = {
-            "good",
-            "great",
-            "excellent",
-            "amazing",
-            "wonderful",
-            "fantastic",
-            "awesome",
-            "brilliant",
-            "outstanding",
-            "perfect",
-            "love",
-            "like",
-            "happy",
-            "pleased",
-            "satisfied",
-            "impressed",
-            "recommend",
-        }
+    # Simple keyword-based sentiment analysis
+    positive_words = POSITIVE_WORDS
+    negative_words = NEGATIVE_WORDS
+
+    # Word -> +1 (positive) / -1 (negative), so scoring needs one lookup
+    _lexicon = {
+        **dict.fromkeys(positive_words, 1),
+        **dict.fromkeys(negative_words, -1),
+    }
+
+    # Finds whole keywords directly, so non-keyword words are never
+    # materialized. Keywords must not touch other letters, which matches
+    # splitting the text into runs of letters.
+    _keyword_re = re.compile(
+        r"(?<![a-z])(?:%s)(?![a-z])"
+        % "|".join(map(re.escape, sorted(_lexicon, key=len, reverse=True)))
+    )
 
-        self.negative_words = {
-            "bad",
-            "terrible",
-            "awful",
-            "horrible",
-            "disappointing",
-            "hate",
-            "dislike",
-            "angry",
-            "frustrated",
-            "annoyed",
-            "poor",
-            "worst",
-            "useless",
-            "broken",
-            "failed",
-            "error",
-            "problem",
-            "issue",
-        }
+    # Texts shorter than the shortest keyword cannot contain one
+    _min_word_length = min(map(len, _lexicon))
+
+    # Longest text kept in the count cache (the /predict limit), so memory
+    # stays bounded by cache_size * max_cached_length characters
+    max_cached_length = 1000
+
+    def __init__(self, cache_size: int = 4096):
+        # Repeated texts (retries, duplicates within a batch) skip
+        # tokenization; counts are immutable tuples so sharing is safe
+        self._count_words_cached = functools.lru_cache(maxsize=cache_size)(
+            self._count_words
+        )
 
     def predict(self, text: str) -> Dict[str, Any]:
         """Predict sentiment of the given text"""
@@ -81,40 +174,63 @@ class SentimentAnalyzer:
                 "error": "Invalid input text",
             }
 
-        text_lower = text.lower()
-        # Remove punctuation and split into words
-        import string
-
-        text_clean = text_lower.translate(
-            str.maketrans("", "", string.punctuation)
-        )
-        words = text_clean.split()
-
-        positive_count = sum(
-            1 for word in words if word in self.positive_words
-        )
-        negative_count = sum(
-            1 for word in words if word in self.negative_words
-        )
-
+        return self._classify(*self._count(text))
+
+    def predict_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Predict sentiment of each of the given texts"""
+        # Bind the per-text helpers once for the whole batch
+        predict = self.predict
+        count = self._count
+        classify = self._classify
+
+        return [
+            classify(*count(text))
+            if text and isinstance(text, str)
+            else predict(text)
+            for text in texts
+        ]
+
+    def _count(self, text: str) -> Tuple[int, int]:
+        """Count sentiment words, caching results for short texts only"""
+        if len(text) <= self.max_cached_length:
+            return self._count_words_cached(text)
+        return self._count_words(text)
+
+    def _count_words(self, text: str) -> Tuple[int, int]:
+        """Count positive and negative words in the given text"""
+        if len(text) < self._min_word_length:
+            return 0, 0
+
+        # Score every keyword hit against the merged lexicon; map() and
+        # list.count() keep the per-word loop in C
+        keywords = self._keyword_re.findall(text.lower())
+        scores = list(map(self._lexicon.__getitem__, keywords))
+        positive_count = scores.count(1)
+        negative_count = scores.count(-1)
+
+        return positive_count, negative_count
+
+    @staticmethod
+    def _classify(positive_count: int, negative_count: int) -> Dict[str, Any]:
+        """Build the prediction result from the word counts"""
         total_sentiment_words = positive_count + negative_count
 
         if total_sentiment_words == 0:
-            sentiment = "neutral"
-            confidence = 0.5
-        elif positive_count > negative_count:
+            return dict(_NEUTRAL_RESULT)
+
+        if positive_count > negative_count:
             sentiment = "positive"
-            confidence = positive_count / total_sentiment_words
+            confidence = _confidence(positive_count, total_sentiment_words)
         elif negative_count > positive_count:
             sentiment = "negative"
-            confidence = negative_count / total_sentiment_words
+            confidence = _confidence(negative_count, total_sentiment_words)
         else:
             sentiment = "neutral"
             confidence = 0.5
 
         return {
             "sentiment": sentiment,
-            "confidence": round(confidence, 3),
+            "confidence": confidence,
             "positive_words": positive_count,
             "negative_words": negative_count,
         }
@@ -124,8 +240,29 @@ class SentimentAnalyzer:
 model = SentimentAnalyzer()
 
 
+def json_response(payload: Any, status: int = 200) -> Response:
+    """Serialize payload to a JSON response using orjson"""
+    try:
+        body = orjson.dumps(payload)
+    except orjson.JSONEncodeError:
+        # orjson rejects strings with lone surrogates, which are valid JSON
+        # input echoed back from requests; the stdlib escapes them instead
+        body = json.dumps(payload)
+    return Response(body, status=status, mimetype="application/json")
+
+
+def static_json_response(body: bytes) -> Response:
+    """Serve a pre-serialized JSON body that must not be cached"""
+    return Response(
+        body,
+        status=200,
+        mimetype="application/json",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
 def put_metric(metric_name: str, value: float, unit: str = "Count"):
-    """Put custom metric to CloudWatch"""
+    """Queue custom metric for CloudWatch"""
     if cloudwatch is None:
         logger.debug(
             f"CloudWatch not available, skipping metric: {metric_name}"
@@ -133,40 +270,80 @@ def put_metric(metric_name: str, value: float, unit: str = "Count"):
         return
 
     try:
-        cloudwatch.put_metric_data(
-            Namespace="MLModel/SentimentAnalysis",
-            MetricData=[
-                {
-                    "MetricName": metric_name,
-                    "Value": value,
-                    "Unit": unit,
-                    "Dimensions": [
-                        {
-                            "Name": "Environment",
-                            "Value": os.getenv("ENVIRONMENT", "dev"),
-                        }
-                    ],
-                }
-            ],
+        _metric_queue.put_nowait(
+            {
+                "MetricName": metric_name,
+                "Value": value,
+                "Unit": unit,
+                "Dimensions": _METRIC_DIMENSIONS,
+            }
         )
-    except ClientError as e:
-        logger.error(f"Failed to put metric {metric_name}: {e}")
+    except queue.Full:
+        logger.warning(f"Metric queue full, dropping metric: {metric_name}")
+        return
+
+    if _metric_queue.qsize() >= METRIC_BATCH_SIZE:
+        _metric_flush_event.set()
+
+
+def flush_metrics():
+    """Send all queued metrics to CloudWatch in batches"""
+    with _metric_flush_lock:
+        while True:
+            batch = []
+            while len(batch) < METRIC_BATCH_SIZE:
+                try:
+                    batch.append(_metric_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if not batch:
+                return
+
+            if cloudwatch is None:
+                continue
+
+            try:
+                cloudwatch.put_metric_data(
+                    Namespace=METRIC_NAMESPACE, MetricData=batch
+                )
+            except (BotoCoreError, ClientError) as e:
+                logger.error(f"Failed to put {len(batch)} metrics: {e}")
+
+
+def _metric_flusher():
+    """Flush metrics every interval, or sooner once a batch is full"""
+    while True:
+        _metric_flush_event.wait(METRIC_FLUSH_INTERVAL)
+        _metric_flush_event.clear()
+        try:
+            flush_metrics()
+        except Exception as e:
+            logger.error(f"Error flushing metrics: {str(e)}")
+
+
+if cloudwatch is not None:
+    threading.Thread(
+        target=_metric_flusher, name="metric-flusher", daemon=True
+    ).start()
+    atexit.register(flush_metrics)
+
+
+# Static endpoint payloads, serialized once instead of per request
+_HEALTH_BODY = orjson.dumps(
+    {
+        "status": "healthy",
+        "service": "ml-sentiment-analysis",
+        "version": "1.0.0",
+        "environment": ENVIRONMENT,
+    }
+)
 
 
 @app.route("/health", methods=["GET"])
 def health_check():
     """Health check endpoint"""
-    return (
-        jsonify(
-            {
-                "status": "healthy",
-                "service": "ml-sentiment-analysis",
-                "version": "1.0.0",
-                "environment": os.getenv("ENVIRONMENT", "dev"),
-            }
-        ),
-        200,
-    )
+    return static_json_response(_HEALTH_BODY)
 
 
 @app.route("/predict", methods=["POST"])
@@ -176,22 +353,24 @@ def predict_sentiment():
         data = request.get_json()
 
         if not data or "text" not in data:
-            return jsonify({"error": "Missing required field: text"}), 400
+            return json_response(
+                {"error": "Missing required field: text"}, 400
+            )
 
         text = data["text"]
 
         # Validate input
-        if not isinstance(text, str) or len(text.strip()) == 0:
-            return jsonify({"error": "Text must be a non-empty string"}), 400
+        if not isinstance(text, str) or not text or text.isspace():
+            return json_response(
+                {"error": "Text must be a non-empty string"}, 400
+            )
 
         if len(text) > 1000:
-            return (
-                jsonify(
-                    {
-                        "error": "Text too long. Maximum 1000 characters "
-                        "allowed."
-                    }
-                ),
+            return json_response(
+                {
+                    "error": "Text too long. Maximum 1000 characters "
+                    "allowed."
+                },
                 400,
             )
 
@@ -208,14 +387,12 @@ def predict_sentiment():
             f"(confidence: {result['confidence']})"
         )
 
-        return (
-            jsonify(
-                {
-                    "prediction": result,
-                    "input_text": text,
-                    "model_version": "1.0.0",
-                }
-            ),
+        return json_response(
+            {
+                "prediction": result,
+                "input_text": text,
+                "model_version": "1.0.0",
+            },
             200,
         )
 
@@ -223,9 +400,8 @@ def predict_sentiment():
         logger.error(f"Error in prediction: {str(e)}")
         put_metric("Errors", 1)
 
-        return (
-            jsonify({"error": "Internal server error", "message": str(e)}),
-            500,
+        return json_response(
+            {"error": "Internal server error", "message": str(e)}, 500
         )
 
 
@@ -236,30 +412,29 @@ def batch_predict():
         data = request.get_json()
 
         if not data or "texts" not in data:
-            return jsonify({"error": "Missing required field: texts"}), 400
+            return json_response(
+                {"error": "Missing required field: texts"}, 400
+            )
 
         texts = data["texts"]
 
         if not isinstance(texts, list):
-            return jsonify({"error": "Texts must be a list"}), 400
+            return json_response({"error": "Texts must be a list"}, 400)
 
         if len(texts) > 100:
-            return (
-                jsonify(
-                    {"error": "Too many texts. Maximum 100 texts allowed."}
-                ),
-                400,
+            return json_response(
+                {"error": "Too many texts. Maximum 100 texts allowed."}, 400
             )
 
-        results = []
-        for i, text in enumerate(texts):
-            if not isinstance(text, str):
-                results.append({"index": i, "error": "Text must be a string"})
-            else:
-                prediction = model.predict(text)
-                results.append(
-                    {"index": i, "prediction": prediction, "input_text": text}
-                )
+        predictions = iter(
+            model.predict_batch([t for t in texts if isinstance(t, str)])
+        )
+        results = [
+            {"index": i, "prediction": next(predictions), "input_text": text}
+            if isinstance(text, str)
+            else {"index": i, "error": "Text must be a string"}
+            for i, text in enumerate(texts)
+        ]
 
         # Log metrics
         put_metric("BatchPredictions", 1)
@@ -267,14 +442,12 @@ def batch_predict():
 
         logger.info(f"Batch prediction made for {len(texts)} texts")
 
-        return (
-            jsonify(
-                {
-                    "results": results,
-                    "total_texts": len(texts),
-                    "model_version": "1.0.0",
-                }
-            ),
+        return json_response(
+            {
+                "results": results,
+                "total_texts": len(texts),
+                "model_version": "1.0.0",
+            },
             200,
         )
 
@@ -282,95 +455,84 @@ def batch_predict():
         logger.error(f"Error in batch prediction: {str(e)}")
         put_metric("Errors", 1)
 
-        return (
-            jsonify({"error": "Internal server error", "message": str(e)}),
-            500,
+        return json_response(
+            {"error": "Internal server error", "message": str(e)}, 500
         )
 
 
+# This would typically query a database or cache
+# For now, serve static metrics
+_METRICS_BODY = orjson.dumps(
+    {
+        "model_info": {
+            "name": "Sentiment Analysis Model",
+            "version": "1.0.0",
+            "type": "keyword-based",
+            "supported_languages": ["en"],
+        },
+        "performance": {
+            # Would be tracked in production
+            "total_predictions": 0,
+            "average_confidence": 0.0,
+            "accuracy": 0.0,
+        },
+        "endpoints": {
+            "predict": "/predict",
+            "batch_predict": "/batch-predict",
+            "health": "/health",
+        },
+    }
+)
+
+
 @app.route("/metrics", methods=["GET"])
 def get_metrics():
     """Get model metrics and statistics"""
-    try:
-        # This would typically query a database or cache
-        # For now, return static metrics
-        return (
-            jsonify(
-                {
-                    "model_info": {
-                        "name": "Sentiment Analysis Model",
-                        "version": "1.0.0",
-                        "type": "keyword-based",
-                        "supported_languages": ["en"],
-                    },
-                    "performance": {
-                        # Would be tracked in production
-                        "total_predictions": 0,
-                        "average_confidence": 0.0,
-                        "accuracy": 0.0,
-                    },
-                    "endpoints": {
-                        "predict": "/predict",
-                        "batch_predict": "/batch-predict",
-                        "health": "/health",
-                    },
-                }
-            ),
-            200,
-        )
-
-    except Exception as e:
-        logger.error(f"Error getting metrics: {str(e)}")
-        return (
-            jsonify({"error": "Internal server error", "message": str(e)}),
-            500,
-        )
+    return static_json_response(_METRICS_BODY)
+
+
+_ROOT_BODY = orjson.dumps(
+    {
+        "service": "ML Sentiment Analysis API",
+        "version": "1.0.0",
+        "status": "running",
+        "environment": ENVIRONMENT,
+        "endpoints": {
+            "health": "/health",
+            "predict": "/predict",
+            "batch_predict": "/batch-predict",
+            "metrics": "/metrics",
+        },
+        "documentation": {
+            "predict": {
+                "method": "POST",
+                "body": {"text": "string"},
+                "description": "Predict sentiment of a single text",
+            },
+            "batch_predict": {
+                "method": "POST",
+                "body": {"texts": ["string1", "string2"]},
+                "description": "Predict sentiment of multiple texts",
+            },
+        },
+    }
+)
 
 
 @app.route("/", methods=["GET"])
 def root():
     """Root endpoint with API information"""
-    return (
-        jsonify(
-            {
-                "service": "ML Sentiment Analysis API",
-                "version": "1.0.0",
-                "status": "running",
-                "environment": os.getenv("ENVIRONMENT", "dev"),
-                "endpoints": {
-                    "health": "/health",
-                    "predict": "/predict",
-                    "batch_predict": "/batch-predict",
-                    "metrics": "/metrics",
-                },
-                "documentation": {
-                    "predict": {
-                        "method": "POST",
-                        "body": {"text": "string"},
-                        "description": "Predict sentiment of a single text",
-                    },
-                    "batch_predict": {
-                        "method": "POST",
-                        "body": {"texts": ["string1", "string2"]},
-                        "description": "Predict sentiment of multiple texts",
-                    },
-                },
-            }
-        ),
-        200,
-    )
+    return static_json_response(_ROOT_BODY)
 
 
 @app.errorhandler(404)
 def not_found(error):
     """Handle 404 errors"""
-    return (
-        jsonify(
-            {
-                "error": "Endpoint not found",
-                "message": "The requested endpoint does not exist",
-            }
-        ),
+    return json_response(
+        {
+            "error": "Endpoint not found",
+            "message": "The requested endpoint does not exist",
+        },
         404,
     )
 
@@ -378,22 +540,20 @@ def not_found(error):
 @app.errorhandler(405)
 def method_not_allowed(error):
     """Handle 405 errors"""
-    return (
-        jsonify(
-            {
-                "error": "Method not allowed",
-                "message": "The HTTP method is not allowed for this endpoint",
-            }
-        ),
+    return json_response(
+        {
+            "error": "Method not allowed",
+            "message": "The HTTP method is not allowed for this endpoint",
+        },
         405,
     )
 
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8080))
-    debug = os.getenv("ENVIRONMENT", "dev") == "dev"
+    debug = ENVIRONMENT == "dev"
 
     logger.info(f"Starting ML Sentiment Analysis API on port {port}")
-    logger.info(f"Environment: {os.getenv('ENVIRONMENT', 'dev')}")
+    logger.info(f"Environment: {ENVIRONMENT}")
 
     app.run(host="0.0.0.0", port=port, debug=debug)
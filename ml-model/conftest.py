@@ -4,24 +4,18 @@ Pytest configuration for ML model tests
 
 import os
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 
-@pytest.fixture(autouse=True)
+# app reads these once at import time, so set them before it is imported;
+# also keeps app from creating a real CloudWatch client
+os.environ['ENVIRONMENT'] = 'test'
+os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+os.environ['DISABLE_CLOUDWATCH'] = '1'
+
+@pytest.fixture
 def mock_aws_services():
-    """Mock AWS services for testing"""
+    """Mock AWS services for tests that exercise metric paths"""
     with patch('app.cloudwatch') as mock_cloudwatch:
         # Mock CloudWatch client
         mock_cloudwatch.put_metric_data.return_value = {}
         yield mock_cloudwatch
-
-@pytest.fixture(autouse=True)
-def test_environment():
-    """Set test environment variables"""
-    os.environ['ENVIRONMENT'] = 'test'
-    os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
-    yield
-    # Clean up
-    if 'ENVIRONMENT' in os.environ:
-        del os.environ['ENVIRONMENT']
-    if 'AWS_DEFAULT_REGION' in os.environ:
-        del os.environ['AWS_DEFAULT_REGION']
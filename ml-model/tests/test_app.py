@@ -4,7 +4,7 @@ Tests for the ML Sentiment Analysis API
 
 import pytest
 import json
-from app import app, model
+from app import app, model, put_metric, flush_metrics
 
 @pytest.fixture
 def client():
@@ -21,6 +21,8 @@ def test_health_check(client):
     data = json.loads(response.data)
     assert data['status'] == 'healthy'
     assert data['service'] == 'ml-sentiment-analysis'
+    assert data['environment'] == 'test'
+    assert response.headers['Cache-Control'] == 'no-cache'
 
 def test_root_endpoint(client):
     """Test root endpoint"""
@@ -76,6 +78,34 @@ def test_predict_empty_text(client):
     data = json.loads(response.data)
     assert 'error' in data
 
+def test_predict_whitespace_text(client):
+    """Test prediction with whitespace-only text"""
+    response = client.post('/predict', json={'text': ' \n\t '})
+    assert response.status_code == 400
+
+    data = json.loads(response.data)
+    assert 'error' in data
+
+def test_predict_lone_surrogate(client):
+    """Test input containing a lone surrogate is echoed back"""
+    body = '{"text": "good \\ud800"}'
+    response = client.post('/predict', data=body,
+                           content_type='application/json')
+    assert response.status_code == 200
+
+    data = json.loads(response.data)
+    assert data['input_text'] == 'good \ud800'
+    assert data['prediction']['sentiment'] == 'positive'
+
+    body = '{"texts": ["good \\ud800", "bad"]}'
+    response = client.post('/batch-predict', data=body,
+                           content_type='application/json')
+    assert response.status_code == 200
+
+    data = json.loads(response.data)
+    assert data['results'][0]['input_text'] == 'good \ud800'
+    assert data['results'][1]['prediction']['sentiment'] == 'negative'
+
 def test_predict_long_text(client):
     """Test prediction with text too long"""
     long_text = 'a' * 1001
@@ -100,6 +130,57 @@ def test_batch_predict(client):
     assert len(data['results']) == 3
     assert data['total_texts'] == 3
 
+def test_batch_predict_mixed_types(client):
+    """Test batch prediction keeps results aligned with non-string texts"""
+    texts = ['This is great!', 42, 'This is terrible!']
+
+    response = client.post('/batch-predict', json={'texts': texts})
+    assert response.status_code == 200
+
+    results = json.loads(response.data)['results']
+    assert [r['index'] for r in results] == [0, 1, 2]
+    assert results[0]['prediction']['sentiment'] == 'positive'
+    assert 'error' in results[1]
+    assert results[2]['prediction']['sentiment'] == 'negative'
+
+def test_model_predict_batch():
+    """Test batch prediction matches single predictions"""
+    texts = ['This is great!', 'This is terrible!', 'This is okay.', '']
+    assert model.predict_batch(texts) == [model.predict(t) for t in texts]
+
+def test_model_predict_whole_words():
+    """Test keywords only match as whole words"""
+    result = model.predict('I dislike how likely unlikeable goodness is')
+    assert result['positive_words'] == 0
+    assert result['negative_words'] == 1
+
+def test_model_predict_confidence():
+    """Test confidence for small and large keyword counts"""
+    result = model.predict('great great bad')
+    assert result['confidence'] == 0.667
+
+    result = model.predict('great ' * 30 + 'bad ' * 10)
+    assert result['sentiment'] == 'positive'
+    assert result['confidence'] == 0.75
+
+def test_model_predict_cached():
+    """Test repeated texts are served from the prediction cache"""
+    hits = model._count_words_cached.cache_info().hits
+    first = model.predict('A cached and excellent text')
+    second = model.predict('A cached and excellent text')
+    assert first == second
+    assert first is not second
+    assert model._count_words_cached.cache_info().hits == hits + 1
+
+def test_model_predict_long_text_not_cached():
+    """Test texts over the cache length limit are not cached"""
+    long_text = 'great ' * 1000
+    size = model._count_words_cached.cache_info().currsize
+    result = model.predict(long_text)
+    assert result['positive_words'] == 1000
+    model.predict_batch([long_text, long_text + 'bad'])
+    assert model._count_words_cached.cache_info().currsize == size
+
 def test_batch_predict_missing_texts(client):
     """Test batch prediction with missing texts"""
     response = client.post('/batch-predict', json={})
@@ -162,3 +243,26 @@ def test_model_predict():
     result = model.predict('')
     assert result['sentiment'] == 'neutral'
     assert 'error' in result
+
+def test_model_predict_punctuation():
+    """Test that punctuation does not hide sentiment words"""
+    result = model.predict('Great!!! (really) "excellent", awful...')
+    assert result['sentiment'] == 'positive'
+    assert result['positive_words'] == 2
+    assert result['negative_words'] == 1
+
+def test_metrics_are_batched(mock_aws_services):
+    """Test metrics are buffered and sent in batches of 20"""
+    flush_metrics()
+    mock_aws_services.put_metric_data.reset_mock()
+
+    for _ in range(25):
+        put_metric('Predictions', 1)
+    flush_metrics()
+
+    batch_sizes = [
+        len(call.kwargs['MetricData'])
+        for call in mock_aws_services.put_metric_data.call_args_list
+    ]
+    assert sum(batch_sizes) == 25
+    assert max(batch_sizes) <= 20